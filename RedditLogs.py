@@ -1,14 +1,186 @@
 #!/usr/bin/env python3
 
-from loguru import logger #Must be first import
-
-from configparser import ConfigParser
+from collections import OrderedDict
 from time import time
 from datetime import datetime
+from functools import lru_cache, partialmethod
+
+from bot_config import load_config
 
-config = ConfigParser()
-config.read('config.ini')
+# Log levels used by RedditLogs. These are normally registered by bot_logging,
+# but are registered by `_get_logger` too if missing, as loguru raises on
+# unknown levels.
+LOG_LEVELS = (
+	"SUBMISSIONS", "COMMENTS", "HOT", "RISING", "TOP", "CONTROVERSIAL"
+	, "UNMODERATED", "SPAM", "REMOVED", "MODQUEUE", "EDITED", "MODLOG"
+)
+_logger = None
+
+config = load_config()
 SHOW_DELAY = config["LOGGING"].getboolean("Show_Delay", False)
+# Prefix for submission shortlinks
+SHORTLINK = "https://redd.it/"
+# Number of author display names remembered by RedditLogs
+NAME_CACHE_SIZE = 256
+
+# Human-readable names for modlog actions, keyed by the action Reddit returns
+_MODLOG_ACTIONS = {
+	"acceptmoderatorinvite":"accept moderator invite"
+	,"add_community_topics":"add community topics"
+	,"addcontributor":"add contributor"
+	,"addmoderator":"add moderator"
+	,"addremovalreason":"add removal reason"
+	,"adjust_post_crowd_control_level":"adjust post crowd control level"
+	,"approvecomment":"approve comment"
+	,"approvelink":"approve post"
+	,"banuser":"ban user"
+	,"collections":"collections"
+	,"community_status":"community status"
+	,"community_styling":"style community"
+	,"community_widgets":"widgets"
+	,"create_award":"create award"
+	,"create_scheduled_post":"create scheduled post"
+	,"createremovalreason":"create removal reason"
+	,"createrule":"create rule"
+	,"delete_award":"delete award"
+	,"delete_scheduled_post":"delete scheduled post"
+	,"deletenote":"delete note"
+	,"deleteoverriddenclassification":"delete overridden subreddit classification"
+	,"deleteremovalreason":"delete removal reason"
+	,"deleterule":"delete rule"
+	,"dev_platform_app_changed":"app changed"
+	,"dev_platform_app_disabled":"app disabled"
+	,"dev_platform_app_enabled":"app enabled"
+	,"dev_platform_app_installed":"app installed"
+	,"dev_platform_app_uninstalled":"app uninstalled"
+	,"disable_award":"disable award"
+	,"disable_post_crowd_control_filter":"disable post crowd control filtering"
+	,"distinguish":"distinguish"
+	,"edit_post_requirements":"edit post requirements"
+	,"edit_saved_response":"edit saved response"
+	,"edit_scheduled_post":"edit scheduled post"
+	,"editflair":"edit flair"
+	,"editrule":"edit rule"
+	,"editsettings":"edit settings"
+	,"enable_award":"enable award"
+	,"enable_post_crowd_control_filter":"enable post crowd control filtering"
+	,"events":"events"
+	,"hidden_award":"award hidden"
+	,"ignorereports":"ignore reports"
+	,"invitemoderator":"invite moderator"
+	,"invitesubscriber":"invite subscriber"
+	,"lock":"lock post"
+	,"marknsfw":"mark nsfw"
+	,"markoriginalcontent":"mark as original content"
+	,"mod_award_given":"mod award given"
+	,"modmail_enrollment":"enroll in new modmail"
+	,"muteuser":"mute user"
+	,"overrideclassification":"override subreddit classification"
+	,"remove_community_topics":"remove community topics"
+	,"removecomment":"remove comment"
+	,"removecontributor":"remove contributor"
+	,"removelink":"remove post"
+	,"removemoderator":"remove moderator"
+	,"removewikicontributor":"remove wiki contributor"
+	,"reordermoderators":"reorder moderators"
+	,"reorderremovalreason":"reorder removal reason"
+	,"reorderrules":"reorder rules"
+	,"setcontestmode":"set contest mode"
+	,"setpermissions":"permissions"
+	,"setsuggestedsort":"set suggested sort"
+	,"showcomment":"show comment"
+	,"snoozereports":"snooze reports"
+	,"spamcomment":"spam comment"
+	,"spamlink":"spam post"
+	,"spoiler":"mark spoiler"
+	,"sticky":"sticky post"
+	,"submit_content_rating_survey":"submit content rating survey"
+	,"submit_scheduled_post":"submit scheduled post"
+	,"unbanuser":"unban user"
+	,"unignorereports":"unignore reports"
+	,"uninvitemoderator":"uninvite moderator"
+	,"unlock":"unlock post"
+	,"unmuteuser":"unmute user"
+	,"unsetcontestmode":"unset contest mode"
+	,"unsnoozereports":"unsnooze reports"
+	,"unspoiler":"unmark spoiler"
+	,"unsticky":"unsticky post"
+	,"updateremovalreason":"update removal reason"
+	,"wikibanned":"ban from wiki"
+	,"wikicontributor":"add wiki contributor"
+	,"wikipagelisted":"delist/relist wiki pages"
+	,"wikipermlevel":"wiki page permissions"
+	,"wikirevise":"wiki revise page"
+	,"wikiunbanned":"unban from wiki"
+}
+
+# Modlog actions on posts and comments that get a "<mod> <verb> <item>" message
+_MOD_VERBS = {
+	"approvelink":"approved"
+	,"approvecomment":"approved"
+	,"removelink":"removed"
+	,"removecomment":"removed"
+	,"spamlink":"spammed"
+	,"spamcomment":"spammed"
+}
+
+
+def _get_logger():
+	"""
+	Import loguru and register RedditLogs' log levels the first time a logger
+	is needed, so that importing this module doesn't pay loguru's setup cost.
+
+	Returns
+	-------
+	loguru.Logger
+	"""
+	global _logger
+	if _logger is None:
+		from loguru import logger
+		for level in LOG_LEVELS:
+			try: logger.level(level)
+			except ValueError: logger.level(level, no=20)
+		_logger = logger
+	return _logger
+
+
+@lru_cache(maxsize=512)
+def _fmt_edit_time(timestamp):
+	"""
+	Format an edit timestamp for display. Streams frequently see the same edit
+	more than once, so results are cached.
+	"""
+	return str(datetime.fromtimestamp(timestamp))
+
+
+def _build_modlog_link(target_fullname, target_permalink, target_author):
+	"""
+	Build a link to the target of a modlog entry.
+
+	Params
+	------
+	target_fullname : str | None
+	target_permalink : str | None
+	target_author : str | None
+
+	Returns
+	-------
+	str | None : None if the entry has no target, or the target isn't a
+		comment, user, or submission.
+	"""
+	if not target_fullname: return None
+	# Reddit fullnames always begin with their type prefix
+	prefix = target_fullname[:3]
+	if prefix == "t1_":
+		start = target_permalink.index("comments/") + 9
+		parent_id = target_permalink[start:target_permalink.index("/", start)]
+		return f"https://reddit.com/comments/{parent_id}/-/{target_fullname[3:]}"
+	elif prefix == "t2_":
+		return f"/u/{target_author}"
+	elif prefix == "t3_":
+		return f"https://reddit.com/{target_fullname[3:]}"
+	return None
+
 
 class RedditLogs:
 	"""
@@ -20,10 +192,21 @@ class RedditLogs:
 	show_delay : boolean
 		whether to include the calculated delay between when an item was created
 		and when it was picked up by the bot. Defaults to False.
+
+	Note
+	----
+	RedditLogs uses `__slots__`, so arbitrary attributes can't be set on an
+	instance; subclass it if you need to store additional state.
 	"""
+	__slots__ = ("r", "show_delay", "_name_cache", "_lazy_logger")
+
 	def __init__(self, r=None, show_delay=SHOW_DELAY):
 		self.r = r
 		self.show_delay = show_delay
+		self._name_cache = OrderedDict()
+		# Bound once, as `logger.opt()` builds a new logger on every call. The
+		# depth attributes records to the log_* method rather than to __log.
+		self._lazy_logger = _get_logger().opt(lazy=True, depth=1)
 
 
 	def __calc_delay(self, item_time):
@@ -33,25 +216,24 @@ class RedditLogs:
 
 		Params
 		------
-		item_time : int | float
+		item_time : int | float | None
 
 		Returns
 		-------
 		str
 		"""
 		if not self.show_delay: return ""
-		try:
-			if self.show_delay:
-					delay_time = int(time() - item_time)
-					return f"(Delay: {delay_time}) "
-			else: return ""
-		except: return ("(unknown delay) ")
+		if item_time is None: return "(unknown delay) "
+		return f"(Delay: {int(time() - item_time)}) "
 
 
 	def __get_author_name(self, item):
 		"""
 		get the item author's display name, if available, or else return `[deleted]`
 
+		Names are cached by the item's fullname, as the same item frequently
+		passes through several streams (submissions, edited, modqueue, etc).
+
 		Params
 		------
 		item : praw.models.Comment | praw.models.Submission
@@ -60,14 +242,104 @@ class RedditLogs:
 		-------
 		str : the author's name
 		"""
-		try:
-			name = item.author.name
-			return f"/u/{name}"
-		except AttributeError:
-			return "[deleted]"
+		fullname = item.fullname
+		name = self._name_cache.get(fullname)
+		if name is not None:
+			self._name_cache.move_to_end(fullname)
+			return name
+		# PRAW sets `author` to None for deleted accounts
+		author = item.author
+		name = "[deleted]" if author is None else f"/u/{author.name}"
+		self._name_cache[fullname] = name
+		if len(self._name_cache) > NAME_CACHE_SIZE:
+			self._name_cache.popitem(last=False)
+		return name
+
+
+	def __log(self, log_kind, formatter, *args):
+		"""
+		Emit a log message, deferring formatting until loguru has determined
+		that `log_kind` is enabled for at least one sink.
+
+		Params
+		------
+		log_kind : str
+		formatter : callable
+			called with `*args` to build the message, only if it will be logged
+		"""
+		self._lazy_logger.log(log_kind, "{}", lambda: formatter(*args))
+
+
+	def __format_comment(self, item, delay=None, extra=None, name=None):
+		"""
+		Build the log message for a comment.
 
+		Params
+		------
+		item : praw.models.Comment
+		delay : str
+		extra : str
+		name : str
+			the author's display name, if already known
+
+		Returns
+		-------
+		str
+		"""
+		if not name: name = self.__get_author_name(item)
+		# Reddit doesn't give us a convenient way to get the comment shortlink
+		# format from what they provide, so we have to cook that up ourselves.
+		link_permalink = item.link_permalink
+		base = link_permalink[:link_permalink.index("comments/") + 9]
+		permalink = f"{base}{item.parent_id[3:]}/-/{item.id}"
+		if not delay: delay = self.__calc_delay(item.created_utc)
+		# Most messages have neither a delay nor extra text
+		if not delay and not extra: return "".join((permalink, " by ", name))
+		if not extra: extra = ""
+		return f"{delay}{permalink} by {name}{extra}"
 
-	def log_comments(self, item, log_kind="COMMENTS", delay=None, extra=None):
+
+	def __format_submission(self, item, delay=None, extra=None, name=None):
+		"""
+		Build the log message for a submission.
+
+		Params
+		------
+		item : praw.models.Submission
+		delay : str
+		extra : str
+		name : str
+			the author's display name, if already known
+
+		Returns
+		-------
+		str
+		"""
+		if not name: name = self.__get_author_name(item)
+		if not delay: delay = self.__calc_delay(item.created_utc)
+		# Most messages have neither a delay nor extra text
+		if not delay and not extra: return "".join((SHORTLINK, item.id, " by ", name))
+		if not extra: extra = ""
+		return f"{delay}{SHORTLINK}{item.id} by {name}{extra}"
+
+
+	def __format_edited(self, item, kind):
+		"""Build the log message for an edited submission or comment."""
+		delay = self.__calc_delay(item.edited)
+		if isinstance(item.edited, float):
+			edit_time = _fmt_edit_time(item.edited)
+		else:
+			edit_time = item.edited
+		if kind == "submissions":
+			extra = f" (Post Edited @ {edit_time})"
+			return self.__format_submission(item, delay=delay, extra=extra)
+		extra = f" (Comment Edited @ {edit_time})"
+		return self.__format_comment(item, delay=delay, extra=extra)
+
+
+	def log_comments(
+			self, item, log_kind="COMMENTS", delay=None, extra=None, name=None
+		):
 		"""
 		Log message formatter Comments.
 
@@ -82,19 +354,15 @@ class RedditLogs:
 			use this display logic
 		extra : str
 			used for displaying edit time.
+		name : str
+			the author's display name, if already known by the caller.
 		"""
-		name = self.__get_author_name(item)
-		# Reddit doesn't give us a convenient way to get the comment shortlink
-		# format from what they provide, so we have to cook that up ourselves.
-		permalink = item.link_permalink.split("comments/")[0]
-		permalink += f"comments/{item.parent_id[3:]}/-/{item.id}"
-		if not extra: extra = ""
-		if not delay: delay = self.__calc_delay(item.created_utc)
-		msg = f"{delay}{permalink} by {name}{extra}"
-		logger.log(log_kind, msg)
+		self.__log(log_kind, self.__format_comment, item, delay, extra, name)
 
 
-	def log_submissions(self, item, log_kind="SUBMISSIONS", delay=None, extra=None):
+	def log_submissions(
+			self, item, log_kind="SUBMISSIONS", delay=None, extra=None, name=None
+		):
 		"""
 		Log message formatter Submissions.
 
@@ -110,74 +378,48 @@ class RedditLogs:
 			use this display logic
 		extra : str
 			used for displaying edit time.
+		name : str
+			the author's display name, if already known by the caller.
 		"""
-		name = self.__get_author_name(item)
-		if not delay: delay = self.__calc_delay(item.created_utc)
-		if not extra: extra = ""
-		msg = f"{delay}https://redd.it/{item.id} by {name}{extra}"
-		logger.log(log_kind, msg)
-
-
-	def log_hot(self, item):
-		"""Log message formatter for hot"""
-		self.log_submissions(item, log_kind="HOT")
-
-
-	def log_rising(self, item):
-		"""Log message formatter for rising"""
-		self.log_submissions(item, log_kind="RISING")
-
+		self.__log(log_kind, self.__format_submission, item, delay, extra, name)
 
-	def log_top(self, item):
-		"""Log message formatter for top"""
-		self.log_submissions(item, log_kind="TOP")
-
-
-	def log_controversial(self, item):
-		"""Log message formatter for controversial"""
-		self.log_submissions(item, log_kind="CONTROVERSIAL")
-
-
-	def log_unmoderated(self, item):
-		"""Log message formatter for unmoderated"""
-		self.log_submissions(item, log_kind="UNMODERATED")
 
+	def log_by_kind(self, item, kind, log_kind):
+		"""
+		Log message formatter for streams that may contain either submissions
+		or comments.
 
-	def log_spam(self, item, kind):
-		"""Log message formatter for spam."""
+		Params
+		------
+		item : praw.models.Comment | praw.models.Submission
+		kind : str
+			`submissions` or `comments`; items of any other kind are ignored
+		log_kind : str
+			the log level to use, such as `SPAM`, `REMOVED`, or `MODQUEUE`
+		"""
 		if kind == "submissions":
-			self.log_submissions(item, log_kind="SPAM")
+			self.log_submissions(item, log_kind=log_kind)
 		elif kind == "comments":
-			self.log_comments(item, log_kind="SPAM")
+			self.log_comments(item, log_kind=log_kind)
 
 
-	def log_removed(self, item, kind):
-		"""Log message formatter for removed"""
-		if kind == "submissions":
-			self.log_submissions(item, log_kind="REMOVED")
-		elif kind == "comments":
-			self.log_comments(item, log_kind="REMOVED")
-
+	# Log message formatters for submission-only listings
+	log_hot = partialmethod(log_submissions, log_kind="HOT")
+	log_rising = partialmethod(log_submissions, log_kind="RISING")
+	log_top = partialmethod(log_submissions, log_kind="TOP")
+	log_controversial = partialmethod(log_submissions, log_kind="CONTROVERSIAL")
+	log_unmoderated = partialmethod(log_submissions, log_kind="UNMODERATED")
 
-	def log_modqueue(self, item, kind):
-		"""Log message formatter for modqueue"""
-		if kind == "submissions":
-			self.log_submissions(item, log_kind="MODQUEUE")
-		elif kind == "comments":
-			self.log_comments(item, log_kind="MODQUEUE")
+	# Log message formatters for listings of both submissions and comments
+	log_spam = partialmethod(log_by_kind, log_kind="SPAM")
+	log_removed = partialmethod(log_by_kind, log_kind="REMOVED")
+	log_modqueue = partialmethod(log_by_kind, log_kind="MODQUEUE")
 
 
 	def log_edited(self, item, kind):
 		"""Log message formatter for edited"""
-		delay = self.__calc_delay(item.edited)
-		if isinstance(item.edited, float):
-			edit_time = datetime.fromtimestamp(item.edited)
-		else:
-			edit_time = item.edited
-		if kind == "submissions":
-			self.log_submissions(item, log_kind="EDITED", delay=delay, extra=f" (Post Edited @ {edit_time})")
-		elif kind == "comments":
-			self.log_comments(item, log_kind="EDITED", delay=delay, extra=f" (Comment Edited @ {edit_time})")
+		if kind in ("submissions", "comments"):
+			self.__log("EDITED", self.__format_edited, item, kind)
 
 
 	def log_modmail_conversations(self, item):
@@ -192,118 +434,44 @@ class RedditLogs:
 
 	def log_log(self, item):
 		"""Log message formatter for modlog"""
+		self.__log("MODLOG", self.__format_modlog, item)
+
+
+	def log_log_batch(self, items):
+		"""
+		Log message formatter for several modlog entries at once, emitted as a
+		single newline-separated record.
+
+		Params
+		------
+		items : iterable of praw.models.ModAction
+		"""
+		items = list(items)
+		if not items: return
+		self.__log("MODLOG", self.__format_modlog_batch, items)
+
+
+	def __format_modlog_batch(self, items):
+		"""Build a single log message for several modlog entries."""
+		return "\n".join([self.__format_modlog(item) for item in items])
+
+
+	def __format_modlog(self, item):
+		"""Build the log message for a modlog entry."""
 		delay = self.__calc_delay(item.created_utc)
-		actions = {
-			"acceptmoderatorinvite":"accept moderator invite"
-			,"add_community_topics":"add community topics"
-			,"addcontributor":"add contributor"
-			,"addmoderator":"add moderator"
-			,"addremovalreason":"add removal reason"
-			,"adjust_post_crowd_control_level":"adjust post crowd control level"
-			,"approvecomment":"approve comment"
-			,"approvelink":"approve post"
-			,"banuser":"ban user"
-			,"collections":"collections"
-			,"community_status":"community status"
-			,"community_styling":"style community"
-			,"community_widgets":"widgets"
-			,"create_award":"create award"
-			,"create_scheduled_post":"create scheduled post"
-			,"createremovalreason":"create removal reason"
-			,"createrule":"create rule"
-			,"delete_award":"delete award"
-			,"delete_scheduled_post":"delete scheduled post"
-			,"deletenote":"delete note"
-			,"deleteoverriddenclassification":"delete overridden subreddit classification"
-			,"deleteremovalreason":"delete removal reason"
-			,"deleterule":"delete rule"
-			,"dev_platform_app_changed":"app changed"
-			,"dev_platform_app_disabled":"app disabled"
-			,"dev_platform_app_enabled":"app enabled"
-			,"dev_platform_app_installed":"app installed"
-			,"dev_platform_app_uninstalled":"app uninstalled"
-			,"disable_award":"disable award"
-			,"disable_post_crowd_control_filter":"disable post crowd control filtering"
-			,"distinguish":"distinguish"
-			,"edit_post_requirements":"edit post requirements"
-			,"edit_saved_response":"edit saved response"
-			,"edit_scheduled_post":"edit scheduled post"
-			,"editflair":"edit flair"
-			,"editrule":"edit rule"
-			,"editsettings":"edit settings"
-			,"enable_award":"enable award"
-			,"enable_post_crowd_control_filter":"enable post crowd control filtering"
-			,"events":"events"
-			,"hidden_award":"award hidden"
-			,"ignorereports":"ignore reports"
-			,"invitemoderator":"invite moderator"
-			,"invitesubscriber":"invite subscriber"
-			,"lock":"lock post"
-			,"marknsfw":"mark nsfw"
-			,"markoriginalcontent":"mark as original content"
-			,"mod_award_given":"mod award given"
-			,"modmail_enrollment":"enroll in new modmail"
-			,"muteuser":"mute user"
-			,"overrideclassification":"override subreddit classification"
-			,"remove_community_topics":"remove community topics"
-			,"removecomment":"remove comment"
-			,"removecontributor":"remove contributor"
-			,"removelink":"remove post"
-			,"removemoderator":"remove moderator"
-			,"removewikicontributor":"remove wiki contributor"
-			,"reordermoderators":"reorder moderators"
-			,"reorderremovalreason":"reorder removal reason"
-			,"reorderrules":"reorder rules"
-			,"setcontestmode":"set contest mode"
-			,"setpermissions":"permissions"
-			,"setsuggestedsort":"set suggested sort"
-			,"showcomment":"show comment"
-			,"snoozereports":"snooze reports"
-			,"spamcomment":"spam comment"
-			,"spamlink":"spam post"
-			,"spoiler":"mark spoiler"
-			,"sticky":"sticky post"
-			,"submit_content_rating_survey":"submit content rating survey"
-			,"submit_scheduled_post":"submit scheduled post"
-			,"unbanuser":"unban user"
-			,"unignorereports":"unignore reports"
-			,"uninvitemoderator":"uninvite moderator"
-			,"unlock":"unlock post"
-			,"unmuteuser":"unmute user"
-			,"unsetcontestmode":"unset contest mode"
-			,"unsnoozereports":"unsnooze reports"
-			,"unspoiler":"unmark spoiler"
-			,"unsticky":"unsticky post"
-			,"updateremovalreason":"update removal reason"
-			,"wikibanned":"ban from wiki"
-			,"wikicontributor":"add wiki contributor"
-			,"wikipagelisted":"delist/relist wiki pages"
-			,"wikipermlevel":"wiki page permissions"
-			,"wikirevise":"wiki revise page"
-			,"wikiunbanned":"unban from wiki"
-		}
-		if not item.target_fullname:
-			link = None
-		elif "t1_" in item.target_fullname:
-			parent_id = item.target_permalink.split("comments/")[1].split("/")[0]
-			link = f"https://reddit.com/comments/{parent_id}/-/{item.target_fullname[3:]}"
-		elif "t2_" in item.target_fullname:
-			link = f"/u/{item.target_author}"
-		elif "t3_" in item.target_fullname:
-			link = f"https://reddit.com/{item.target_fullname[3:]}"
-   
-		if item.action in ["approvelink","approvecomment"]:
-			msg = f"{delay}/u/{item._mod} approved {link} by /u/{item.target_author}."
-			if item.details: msg += f" ({item.details})"
-		elif item.action in ["removelink", "removecomment"]:
-			msg = f"{delay}/u/{item._mod} removed {link} by /u/{item.target_author}."
-			if item.details: msg += f" ({item.details})"
-		elif item.action in ["spamlink", "spamcomment"]:
-			msg = f"{delay}/u/{item._mod} spammed {link} by /u/{item.target_author}."
+		link = _build_modlog_link(
+			item.target_fullname, item.target_permalink, item.target_author
+		)
+		verb = _MOD_VERBS.get(item.action)
+		if verb is not None and link is not None:
+			msg = f"{delay}/u/{item._mod} {verb} {link} by /u/{item.target_author}."
 			if item.details: msg += f" ({item.details})"
 		else:
-			msg = f"{delay}/u/{item._mod} performed action '{actions[item.action]}'"
-			if link: msg += f" on {link}."
+			# Reddit adds modlog actions from time to time; unknown actions are
+			# logged by their raw name rather than failing the whole log.
+			action = _MODLOG_ACTIONS.get(item.action, item.action)
+			msg = f"{delay}/u/{item._mod} performed action '{action}'"
+			if link is not None: msg += f" on {link}."
 			if item.description: msg += f" Description: '{item.description}'."
 			if item.details: msg += f" ({item.details})"
-		logger.log("MODLOG", msg)
+		return msg
@@ -1,37 +1,122 @@
 #!/usr/bin/env python3
 
+import json
+import os
 import pickle
-from collections import OrderedDict
-from configparser import ConfigParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from random import random, randint
-from time import sleep, time
+from random import Random, random
+from threading import Lock
+from time import monotonic, sleep, time
 
 import praw.models.reddit as praw_models
 from prawcore.exceptions import (
 	BadRequest, ResponseException, ServerError, RequestException
 )
+from requests import Session
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 
+from bot_config import load_config
 from bot_logging import logger
 from RedditLogs import RedditLogs
 
 
-"""
-Variables used here are stored in config.ini. All variables have defaults, in 
-the event that any given item does not appear in the config.ini file.
-"""
-config = ConfigParser()
-config.read('config.ini')
+@dataclass(frozen=True)
+class StreamConfig:
+	"""
+	Settings used by streams and counters, stored in config.ini. All settings
+	have defaults, in the event that any given item (or section) does not 
+	appear in the config.ini file.
+
+	Parameters
+	----------
+	edit_fetch_attempts : int
+		`Edit_Fetch_Attempts` in the `[STREAMS]` section
+	exception_pause : int
+		`Exeption_Pause` in the `[STREAMS]` section
+	log_streams : bool
+		`Log_Streams` in the `[LOGGING]` section
+	ratelimit_exhaustion : bool
+		`Ratelimit_Exhaustion` in the `[LOGGING]` section. Effects 
+		ExponentialCounter
+	min_wait : int
+		`Min_Wait` in the `[STREAMS]` section. Effects ExponentialCounter
+	max_wait : int
+		`Max_Wait` in the `[STREAMS]` section. Effects ExponentialCounter, and
+		the longest wait between fetches with `adaptive_polling`
+	safety_threshold : float
+		`Safety_Factor` in the `[STREAMS]` section. Effects PerformanceCounter
+	seen_items : int
+		`Seen_Items` in the `[STREAMS]` section; the number of seen items each
+		stream remembers (and saves) to avoid yielding an item twice.
+	adaptive_polling : bool
+		`Adaptive_Polling` in the `[STREAMS]` section. If True, streams that
+		rarely see new items are fetched less often, up to every `max_wait`
+		seconds, leaving more API calls for busier streams. New items on quiet
+		streams may then take up to `max_wait` seconds to be yielded, so this
+		is off by default.
+	"""
+	edit_fetch_attempts: int = 3
+	exception_pause: int = 60
+	log_streams: bool = True
+	ratelimit_exhaustion: bool = True
+	min_wait: int = 1
+	max_wait: int = 16
+	safety_threshold: float = 0.9
+	seen_items: int = 1001
+	adaptive_polling: bool = False
+
+
+	@classmethod
+	def from_config(cls, config):
+		"""Build a StreamConfig from a ConfigParser"""
+		return cls(
+			edit_fetch_attempts=config.getint(
+				"STREAMS", "Edit_Fetch_Attempts", fallback=cls.edit_fetch_attempts
+			)
+			, exception_pause=config.getint(
+				"STREAMS", "Exeption_Pause", fallback=cls.exception_pause
+			)
+			, log_streams=config.getboolean(
+				"LOGGING", "Log_Streams", fallback=cls.log_streams
+			)
+			, ratelimit_exhaustion=config.getboolean(
+				"LOGGING", "Ratelimit_Exhaustion", fallback=cls.ratelimit_exhaustion
+			)
+			, min_wait=config.getint("STREAMS", "Min_Wait", fallback=cls.min_wait)
+			, max_wait=config.getint("STREAMS", "Max_Wait", fallback=cls.max_wait)
+			, safety_threshold=config.getfloat(
+				"STREAMS", "Safety_Factor", fallback=cls.safety_threshold
+			)
+			, seen_items=config.getint(
+				"STREAMS", "Seen_Items", fallback=cls.seen_items
+			)
+			, adaptive_polling=config.getboolean(
+				"STREAMS", "Adaptive_Polling", fallback=cls.adaptive_polling
+			)
+		)
+
+
+CFG = StreamConfig.from_config(load_config())
 
-EDIT_FETCH_ATTEMPTS = config["STREAMS"].getint("Edit_Fetch_Attempts", 3)
-EXCEPTION_PAUSE = config["STREAMS"].getint("Exeption_Pause", 60)
-LOG_STREAMS = config["LOGGING"].getboolean("Log_Streams", True)
-#Effects ExponentialCounter
-RATELIMIT_EXHAUSTION = config["LOGGING"].getboolean("Ratelimit_Exhaustion", True)
-MIN_WAIT = config["STREAMS"].getint("Min_Wait", 1)
-MAX_WAIT = config["STREAMS"].getint("Max_Wait", 16)
-#Effects PerformanceCounter
-SAFETY_THRESHOLD = config['STREAMS'].getfloat("Safety_Factor", 0.9)
+# Weight given to the newest sample in a stream's average time between items
+_ARRIVAL_SMOOTHING = 0.25
+
+# Older seen items to try as `before` when Reddit rejects a fetch's `before`
+_BAD_REQUEST_RETRIES = 8
+
+# Streams share a counter, and may update it from MultiStream's worker threads
+_COUNTER_LOCK = Lock()
+
+# Modlog actions that take an item out of the modqueue
+_MODQUEUE_ACTIONS = frozenset({
+	"approvelink", "removelink", "spamlink"
+	, "approvecomment", "removecomment", "spamcomment"
+})
 
 
 class PerformanceCounter:
@@ -60,14 +145,14 @@ class PerformanceCounter:
 	"""
 	def __init__(self, reddit=None, ratelimit_requests=1000, ratelimit_cooldown=600):
 		self.reddit = reddit
-		self.safety_threshold = SAFETY_THRESHOLD
+		self.safety_threshold = CFG.safety_threshold
 		self.ratelimit_requests = ratelimit_requests
-		self.target_requests = int(ratelimit_requests * SAFETY_THRESHOLD)
+		self.target_requests = int(ratelimit_requests * CFG.safety_threshold)
 		self.ratelimit_cooldown = ratelimit_cooldown
-		self.min_wait = (ratelimit_cooldown / ratelimit_requests) / SAFETY_THRESHOLD
+		self.min_wait = (ratelimit_cooldown / ratelimit_requests) / CFG.safety_threshold
 		self.current_wait = self.min_wait
 		self.next_reset_time = 0
-		self.last_time = time()
+		self.last_mono = monotonic()
 		# These do nothing, and only exist for compat with ExponentialCounter
 		self.incremented = False 
 		self.empty_responses = 0
@@ -80,10 +165,10 @@ class PerformanceCounter:
 
 	def jitter(self):
 		"""
-		introduce a random small delay based on the current wait
+		introduce a random small adjustment based on the current wait, 
+		uniformly distributed between plus and minus 1/32nd of the wait.
 		"""
-		max_jitter = self.current_wait / 16
-		return abs(random()*max_jitter - max_jitter/2)
+		return (random() - 0.5) * (self.current_wait / 16)
 
 
 	def end_loop(self):
@@ -95,14 +180,18 @@ class PerformanceCounter:
 		haven't hit our target usage, and "reserve" API calls - calls used in
 		excess of the target usage we're aiming for.
 		"""
+		# Durations are measured on the monotonic clock; Reddit's reset 
+		# timestamp can only be compared against the wall clock.
 		now = time()
-		reset_timestamp = self.reddit.auth.limits['reset_timestamp']
-		last_run_duration = now - self.last_time - self.current_wait
-		self.last_time = now
+		now_mono = monotonic()
+		limits = self.reddit.auth.limits
+		reset_timestamp = limits['reset_timestamp']
+		last_run_duration = now_mono - self.last_mono - self.current_wait
+		self.last_mono = now_mono
 		time_remaining = reset_timestamp - now
 		time_elapsed = self.ratelimit_cooldown - time_remaining
 
-		calls_used = int(self.reddit.auth.limits['used'])
+		calls_used = int(limits['used'])
 		calls_remaining = self.target_requests - calls_used
 		
 		# Allow us to dip into reserve calls if we've exhasted our normal
@@ -136,7 +225,7 @@ class PerformanceCounter:
 			self.current_wait += last_run_duration
 
 		# a bit of jitter so we're not ever hitting the API at a fixed interval
-		self.current_wait = self.current_wait + abs(self.jitter())
+		self.current_wait += self.jitter()
 
 		# There's never a need to wait longer than our next reset.
 		if self.current_wait > time_remaining:
@@ -149,14 +238,18 @@ class PerformanceCounter:
 		if self.current_wait < self.min_wait:
 			self.current_wait = self.min_wait
 
-		msg = f"Current CPS Rate: {current_usage_rate:0.3f} | "
-		msg += f"Future CPS Rate: {future_usage_rate:0.3f} | "
-		msg += f"calls remaining: {calls_remaining} | "
-		msg += f"next reset: ~{time_remaining:0.0f} seconds | "
-		msg += f"Sleeping: ~{self.current_wait:0.3f} seconds"
-		logger.debug(msg)
+		# Formatting is left to loguru, so it's skipped when DEBUG is disabled
+		msg = "Current CPS Rate: {:0.3f} | "
+		msg += "Future CPS Rate: {:0.3f} | "
+		msg += "calls remaining: {} | "
+		msg += "next reset: ~{:0.0f} seconds | "
+		msg += "Sleeping: ~{:0.3f} seconds"
+		logger.debug(
+			msg, current_usage_rate, future_usage_rate, calls_remaining
+			, time_remaining, self.current_wait
+		)
 
-		sleep(abs(self.current_wait))
+		sleep(self.current_wait)
 
 
 class ExponentialCounter:
@@ -179,14 +272,14 @@ class ExponentialCounter:
 		between loops.
 	reddit : praw.Reddit
 	"""
-	def __init__(self, max_counter=MAX_WAIT, reddit=None):
-		self._base = MIN_WAIT
+	def __init__(self, max_counter=CFG.max_wait, reddit=None):
+		self._base = CFG.min_wait
 		self._max = max_counter
 		self.incremented = False
-		self.value = MIN_WAIT
+		self.value = CFG.min_wait
 		self.empty_responses = 0
 		self.reddit = reddit
-		self.throttle_level = MAX_WAIT
+		self.throttle_level = CFG.max_wait
 
 
 	def increment(self):
@@ -194,31 +287,39 @@ class ExponentialCounter:
 		This method will increment the counter exponentially up to the 
 		maximum value, provided that another stream has not already 
 		incremented the counter since a reset of the counter has been called.
+
+		Waits are jittered - a uniformly random wait between `Min_Wait` and 
+		the current backoff - so that bots sharing an account don't back off 
+		in lockstep.
+		While throttled for excessive API usage, the throttle level is used 
+		as-is, as it's a limit rather than a backoff.
 		"""
 		self.incremented = True
-		max_jitter = self._base / MAX_WAIT
-		jitter = random()*max_jitter - max_jitter / 2
-		if self.throttle_level == MAX_WAIT:
-			self.value = self._base + jitter
+		if self.throttle_level == CFG.max_wait:
+			self.value = self.__jittered_wait()
 		else:
-			self.value = self.throttle_level + jitter
+			self.value = self.throttle_level
 		self._base = min(self._base * 2, self._max)
 
 
 	def reset(self):
 		"""Reset the counter"""
-		self._base = MIN_WAIT
-		max_jitter = self._base / MAX_WAIT
-		self._value = MIN_WAIT + random()*max_jitter - max_jitter / 2
+		self._base = CFG.min_wait
+		self.value = self.__jittered_wait()
 		self.incremented = False
 		self.empty_responses = 0
-		self.throttle_level = MAX_WAIT
+		self.throttle_level = CFG.max_wait
+
+
+	def __jittered_wait(self):
+		"""a random wait between `Min_Wait` and the current backoff"""
+		return CFG.min_wait + random() * (self._base - CFG.min_wait)
 
 
 	def end_loop(self):
 		"""Reset the streams for next run, pause for the specified delay"""
 		self.incremented = False
-		logger.debug(f"Sleeping for ~{self.value:0.3f} seconds")
+		logger.debug("Sleeping for ~{:0.3f} seconds", self.value)
 		sleep(self.value)
 		self._calculate_ratelimit_used()
 
@@ -234,34 +335,32 @@ class ExponentialCounter:
 		"""
 		if self.reddit == None: return
 		now = int(time())
-		reset_timestamp = int(self.reddit.auth.limits['reset_timestamp'])
+		limits = self.reddit.auth.limits
+		reset_timestamp = int(limits['reset_timestamp'])
 		next_reset = reset_timestamp-now
 		elapsed = 600 - next_reset
-		used = self.reddit.auth.limits['used']
-		remaining = self.reddit.auth.limits['remaining']
-		if int(used) != 0:
-			usage_rate = float(f"{used/elapsed:0.1f}")
-			used_pct = float(f"{(used/remaining)*100:0.1f}")
-		else:
-			usage_rate = 0
-			used_pct = 0
-		msg = f"Bot has used {used_pct}% of the ratelimit in the last "
-		msg += f"{elapsed} seconds. (Avg Requests: {usage_rate}/second)"
-		logger.debug(msg)
+		used = limits['used']
+		remaining = limits['remaining']
+		# elapsed and remaining can both be 0 right around a ratelimit reset
+		usage_rate = round(used/elapsed, 1) if used and elapsed > 0 else 0
+		used_pct = round((used/remaining)*100, 1) if used and remaining else 0
+		msg = "Bot has used {}% of the ratelimit in the last "
+		msg += "{} seconds. (Avg Requests: {}/second)"
+		logger.debug(msg, used_pct, elapsed, usage_rate)
 		if usage_rate > 1.67 and remaining > 30:
 			msg = f"Excessive API usage ({usage_rate}/second avg > 1.67/second "
 			msg += "avg. Increasing interval between requests by 1.2x to "
 			msg += f"{self.throttle_level} seconds until ratelimit reset. "
 			logger.warning(msg)
 			self.throttle_level = self.throttle_level*1.2
-		elif usage_rate < 1.67 and self.throttle_level > MAX_WAIT:
-			self.throttle_level = MAX_WAIT
+		elif usage_rate < 1.67 and self.throttle_level > CFG.max_wait:
+			self.throttle_level = CFG.max_wait
 			msg = f"Usage rates returned to sustainable levels ({usage_rate}"
 			msg += "/second). Restoring normal request intervals."
-			logger.info()
-		elif remaining < RATELIMIT_EXHAUSTION:
+			logger.info(msg)
+		elif remaining < CFG.ratelimit_exhaustion:
 			msg = f"Ratelimit functionally exhausted (remaining < "
-			msg += f"{RATELIMIT_EXHAUSTION}). Sleeping for {remaining+1} "
+			msg += f"{CFG.ratelimit_exhaustion}). Sleeping for {remaining+1} "
 			msg += "seconds until past ratelimit reset time."
 			logger.warning(msg)
 			sleep(remaining+1)
@@ -272,55 +371,99 @@ class BoundedSet:
 	A set with a maximum size that evicts the oldest items when necessary.
 	This class does not implement the complete set interface.
 
+	Items are kept in a set for membership tests, with a parallel deque
+	recording insertion order for indexing and evicting the oldest item.
+
 	Note
 	----
 	This class is basically just straight praw code, taken from 7.7.1. 
 	"""
 	def __contains__(self, item):
 		"""Test if the :class:`.BoundedSet` contains item."""
-		self._access(item)
-		return item in self._set
+		return item in self._members
 
 
 	def __init__(self, max_items=1001):
 		"""Initialize a :class:`.BoundedSet` instance."""
 		self.max_items = max_items
-		self._set = OrderedDict()
+		self._members = set()
+		self._order = deque()
 
 
-	def _access(self, item):
-		if item in self._set:
-			self._set.move_to_end(item)
+	def __setstate__(self, state):
+		"""Convert sets pickled when they were backed by an OrderedDict."""
+		self.__dict__.update(state)
+		if "_members" not in state:
+			self._order = deque(state.get("_order", state["_set"]))
+			self._members = set(self._order)
+			del self._set
 
 
 	def add(self, item):
 		"""Add an item to the set discarding the oldest item if necessary."""
-		self._access(item)
-		self._set[item] = None
-		if len(self._set) > self.max_items:
-			self._set.popitem(last=False)
+		if item in self._members:
+			self._order.remove(item)
+		elif len(self._order) >= self.max_items:
+			self._members.discard(self._order.popleft())
+		self._members.add(item)
+		self._order.append(item)
+
+
+	def resize(self, max_items):
+		"""Change the maximum size, discarding the oldest items if necessary."""
+		self.max_items = max_items
+		while len(self._order) > max_items:
+			self._members.discard(self._order.popleft())
 
 
 	def remove(self, item):
 		"""Remove an item by it's attribute from the set."""
-		if item in self._set:
-			self._access(item)
-			self._set.popitem(last=True)
+		if item in self._members:
+			self._members.remove(item)
+			self._order.remove(item)
 
 
 	def empty(self):
 		"""Empty the current set."""
-		self._set = OrderedDict()
+		self._members.clear()
+		self._order.clear()
 
 
 	def __len__(self):
 		"""Enable usage of len() to determine the number of items in a set."""
-		return len(self._set)
+		return len(self._order)
+
+
+	def __iter__(self):
+		"""Iterate over items in the order they were added."""
+		return iter(self._order)
 
 
 	def __getitem__(self, key):
-		"""allows instances of this method to use the [] (indexer) operators"""
-		return list(self._set)[key]
+		"""
+		allows instances of this method to use the [] (indexer) operators.
+		Items are indexed in the order they were added.
+		"""
+		return self._order[key]
+
+
+# Object kinds for praw classes that may come from more than one stream
+_KIND_MAP = {
+	praw_models.comment.Comment: "comments"
+	, praw_models.submission.Submission: "submissions"
+}
+
+
+@lru_cache(maxsize=None)
+def _item_kind(item_class):
+	"""
+	Look up the kind of a praw object by its class, falling back to its base 
+	classes for subclasses of Comment and Submission. Returns `None` for 
+	other classes.
+	"""
+	for cls in item_class.__mro__:
+		if cls in _KIND_MAP: return _KIND_MAP[cls]
+	return None
 
 
 class StreamItem:
@@ -349,11 +492,7 @@ class StreamItem:
 		object kind so that higher-level bot functions don't need to sort that 
 		out on their own.
 		"""
-		if isinstance(item, praw_models.comment.Comment):
-			return "comments"
-		elif isinstance(item, praw_models.submission.Submission):
-			return "submissions"
-		else: return self.stream
+		return _item_kind(type(item)) or self.stream
 
 
 	def __repr__(self):
@@ -381,19 +520,40 @@ class MultiStream:
 		used for passing parameters to streams. For example, to only monitor 
 		edited submissions, ignorning comments, params	would be 
 		`{"edited":{"only":"submissions"}}`
+	parallel : bool
+		if True, streams fetch from Reddit concurrently on a thread pool, and
+		each pass yields its items once every stream has finished fetching.
+		Items are still yielded in the order streams were requested. praw does 
+		not guarantee thread safety, so this is off by default.
 	"""
-	def __init__(self, sub, counter=None, stream_names=[], params={}):
+	def __init__(
+			self, sub, counter=None, stream_names=None, params=None, parallel=False
+		):
 		self.sub = sub
 		if counter:
 			self.counter = counter
 		else:
 			self.counter = PerformanceCounter(reddit=self.sub._reddit)
-		self.stream_names = stream_names
-		self.params = params
+		self.stream_names = stream_names if stream_names is not None else []
+		self.params = params if params is not None else {}
 		self.stream_objects = {}
 		self.stream_generators = {}
+		self._pool = None
+		if parallel and len(self.stream_names) > 1:
+			self._pool = ThreadPoolExecutor(max_workers=len(self.stream_names))
+			_size_connection_pool(self.sub._reddit, len(self.stream_names))
 		self.build_streams()
 		self.log_formatter = RedditLogs()
+		# log formatters for each stream, used by `log_streams`
+		log = self.log_formatter
+		self._log_dispatch = {
+			"submissions": lambda i: log.log_submissions(i.item)
+			, "comments": lambda i: log.log_comments(i.item)
+			, "edited": lambda i: log.log_edited(i.item, i.kind)
+			, "spam": lambda i: log.log_spam(i.item, i.kind)
+			, "log": lambda i: log.log_log(i.item)
+			, "modqueue": lambda i: log.log_modqueue(i.item, i.kind)
+		}
 
 
 	def build_streams(self):
@@ -439,18 +599,49 @@ class MultiStream:
 		item that passes through the stream may be turned off by setting 
 		`Log_Streams` to False in the `[LOGGING]` section of config.ini
 		"""
-		if item.stream == "submissions":
-			self.log_formatter.log_submissions(item.item)
-		elif item.stream == "comments":
-			self.log_formatter.log_comments(item.item)
-		elif item.stream == "edited":
-			self.log_formatter.log_edited(item.item, item.kind)
-		elif item.stream == "spam":
-			self.log_formatter.log_spam(item.item, item.kind)
-		elif item.stream == "log":
-			self.log_formatter.log_log(item.item)
-		elif item.stream == "modqueue":
-			self.log_formatter.log_modqueue(item.item, item.kind)
+		log_item = self._log_dispatch.get(item.stream)
+		if log_item: log_item(item)
+
+
+	def __wait_for_ratelimit_reset(self):
+		"""
+		Sleep until the API ratelimit resets if fewer calls remain than there 
+		are streams to check, rather than making requests that will be 
+		ratelimited.
+		"""
+		limits = self.sub._reddit.auth.limits
+		remaining = limits.get("remaining")
+		reset_timestamp = limits.get("reset_timestamp")
+		# praw doesn't know the limits until a request has been made
+		if remaining is None or reset_timestamp is None: return
+		if remaining >= len(self.stream_generators): return
+		time_remaining = reset_timestamp - time()
+		if time_remaining <= 0: return
+		msg = "Fewer API calls remain ({}) than streams to check ({}). Sleeping "
+		msg += "{:0.0f} seconds until the next API ratelimit reset."
+		logger.warning(msg, remaining, len(self.stream_generators), time_remaining)
+		sleep(time_remaining)
+
+
+	def __poll_streams(self):
+		"""
+		Check each stream once, returning an iterable of new items for each 
+		stream, in the order streams were requested.
+
+		Streams yield `None` once they have no more new items, so that we can 
+		move on to the next stream. Run serially, items are fetched lazily as 
+		they're consumed; run in parallel, every stream is drained before any
+		items are returned, so that consumers never touch a stream's state 
+		while it's fetching.
+		"""
+		generators = list(self.stream_generators.values())
+		if self._pool is None:
+			return [iter(stream.__next__, None) for stream in generators]
+		futures = [self._pool.submit(_drain_stream, s) for s in generators]
+		# Let every stream finish before an error can reach rebuild_streams,
+		# so no worker is still touching a stream that's being replaced.
+		wait(futures)
+		return [future.result() for future in futures]
 
 
 	def streams(self):
@@ -462,23 +653,24 @@ class MultiStream:
 		logger.info("MultiStream streams starting!")
 		while True:
 			try:
-				for stream in self.stream_generators.values():
-					for item in stream:
-						if item is None:
-							# if the stream is done yielding items, we break so 
-							# that we can move on to the next stream
-							break
-						if LOG_STREAMS:
-							# log stream items to the console and file, if enabled
-							self.log_streams(item)
+				has_modqueue = "modqueue" in self.stream_objects
+				polled = zip(self.stream_objects.values(), self.__poll_streams())
+				for stream, stream_items in polled:
+					# log stream items to the console and file, if enabled. 
+					# New modlog entries are logged together, as one record.
+					log_items = CFG.log_streams
+					if log_items and stream.stream_name == "log":
+						stream_items = list(stream_items)
+						self.log_formatter.log_log_batch(
+							[item.item for item in stream_items]
+						)
+						log_items = False
+					for item in stream_items:
+						if log_items: self.log_streams(item)
 						if (
 							item.stream == "log"
-							and	"modqueue" in self.stream_objects.keys()
-							and item.item.action in [
-								"approvelink", "removelink", "spamlink"
-								, "approvecomment", "removecomment"
-								, "spamcomment"
-							]
+							and has_modqueue
+							and item.item.action in _MODQUEUE_ACTIONS
 						):
 							# if we're monitoring the modqueue stream, remove 
 							# actioned items from seen items in the modqueue 
@@ -486,45 +678,90 @@ class MultiStream:
 							self.stream_objects['modqueue'].remove_seen_attribute(
 								item.item.target_fullname
 							)
-							msg = f"Removed '{item.item.target_fullname}' "
-							msg += "from modqueue stream seen items."
-							logger.debug(msg)
+							msg = "Removed '{}' from modqueue stream seen items."
+							logger.debug(msg, item.item.target_fullname)
 						yield item
 				self.counter.end_loop()
+				self.__wait_for_ratelimit_reset()
 			except ResponseException as e:
 				msg = f"Caught praw ResponseException: '{str(e)}'. Attempting "
-				msg += f"to continue in {EXCEPTION_PAUSE} seconds..."
+				msg += f"to continue in {CFG.exception_pause} seconds..."
 				logger.error(msg)
-				sleep(EXCEPTION_PAUSE)
+				sleep(CFG.exception_pause)
 				logger.info("MultiStream streams restarting!")
 				self.rebuild_streams()
 			except RequestException as e:
 				msg = f"Caught praw RequestException: '{str(e)}'. Attempting "
-				msg += f"to continue in {EXCEPTION_PAUSE} seconds..."
+				msg += f"to continue in {CFG.exception_pause} seconds..."
 				logger.error(msg)
-				sleep(EXCEPTION_PAUSE)
+				sleep(CFG.exception_pause)
 				logger.info("MultiStream streams restarting!")
 				self.rebuild_streams()
 			except ServerError as e:
 				msg = f"Caught praw ServerError: '{str(e)}'. Attempting to "
-				msg += f"continue in {EXCEPTION_PAUSE} seconds..."
+				msg += f"continue in {CFG.exception_pause} seconds..."
 				logger.error(msg)
-				sleep(EXCEPTION_PAUSE)
+				sleep(CFG.exception_pause)
 				logger.info("MultiStream streams restarting!")
 				self.rebuild_streams()
 			except Exception:
 				logger.opt(exception=True).critical(f"Unhandled Error:")
 
+def _size_connection_pool(reddit, pool_size):
+	"""
+	Make sure the HTTP session praw uses for `reddit` can keep a connection 
+	alive for each of `pool_size` concurrent requests.
+
+	praw already sends every request through a single requests.Session, so 
+	connections are reused between fetches. The session's connection pool 
+	only holds 10 connections per host though; past that, connections opened
+	by parallel fetches are thrown away, and each of those fetches does a new
+	TLS handshake.
+	"""
+	if pool_size <= DEFAULT_POOLSIZE: return
+	core = reddit._core
+	requestor = getattr(core, "requestor", None) or getattr(core, "_requestor", None)
+	http = getattr(requestor, "_http", None)
+	if not isinstance(http, Session):
+		logger.debug("Unable to resize praw's connection pool.")
+		return
+	http.mount("https://", HTTPAdapter(pool_maxsize=pool_size))
+
+
+def _before_fullname(attribute):
+	"""
+	Return the fullname to fetch a listing `before`, given a seen attribute.
+	`edited` streams store a tuple of fullname and edit time.
+	"""
+	if isinstance(attribute, (list, tuple)): return attribute[0]
+	return attribute
+
+
+def _drain_stream(stream):
+	"""Collect a stream generator's new items, up to the `None` it yields."""
+	return list(iter(stream.__next__, None))
+
+
+def _prepare_params(params):
+	"""
+	Return a copy of stream params, translated to what the Reddit API expects.
+	"""
+	params = dict(params)
+	# Submissions are called links as far as the API is concerned
+	if params.get("only") == "submissions": params["only"] = "links"
+	return params
+
+
 class SubredditStream:
 	"""
 	A single self-healing, position-saving stream of a Reddit listing for a
 	subreddit.
 
 	a SubredditStream instance will save seen items (up to 1000, the max number
-	of items that can be fetched from the API) to disk, in a folder named 
-	`.cache-<subreddit_name>`, where `<subreddit_name>` is the display name of 
-	your subreddit. This allows saving the stream's position across restarts 
-	of the bot. 
+	of items that can be fetched from the API, unless `Seen_Items` is set in 
+	config.ini) to disk, in a folder named `.cache-<subreddit_name>`, where 
+	`<subreddit_name>` is the display name of your subreddit. This allows 
+	saving the stream's position across restarts of the bot. 
 
 	Parameters
 	----------
@@ -535,8 +772,8 @@ class SubredditStream:
 		the praw.Subreddit object corresponding to the subreddit you want to 
 		monitor
 	counter | A Counter Object
-		Defaults to PerformanceCounter. You can also use ExponentialCounter, or
-		a custom implementation
+		Defaults to a new PerformanceCounter for this stream. You can also use
+		ExponentialCounter, or a custom implementation
 	wait_for_edit | int
 		if set to a positive value, will attempt to fetch an edit a set number 
 		of times before giving up. More explination in the docstring for 
@@ -555,66 +792,183 @@ class SubredditStream:
 			self
 			, stream_name
 			, sub=None
-			, counter=PerformanceCounter()
-			, wait_for_edit=EDIT_FETCH_ATTEMPTS
-			, params = {}
+			, counter=None
+			, wait_for_edit=CFG.edit_fetch_attempts
+			, params=None
 		):
 		self.stream_name = stream_name.lower()
 		self.subreddit = sub
 		self._location_base = f".cache-{self.subreddit.display_name}"
-		self._save_location = f"{self._location_base}/{self.stream_name}.pkl"
+		self._save_location = f"{self._location_base}/{self.stream_name}.log"
+		self._legacy_save_location = f"{self._location_base}/{self.stream_name}.pkl"
+		self._journal = None
+		self._journal_lines = 0
+		self._journal_unwritable = False
+		# Ensure our save directory exists
+		try: Path(self._location_base).mkdir(exist_ok=True)
+		except OSError as e:
+			logger.warning(f"Unable to create '{self._location_base}': {e}")
+		if counter is None: counter = PerformanceCounter(reddit=sub._reddit)
 		self._counter = counter
 		self._seen_attributes = self.__load_seen_attributes()
 		self._listing = self._get_listing()
 		self._wait_for_edit = wait_for_edit
-		self.params = params
+		self.params = params if params is not None else {}
+		self._prepared_params = _prepare_params(self.params)
 		self.stream_alive = True
+		self._rng = Random()
+		# average seconds between new items, used to schedule fetches
+		self._ewma_arrival = None
+		self._last_arrival = monotonic()
+		self._next_poll = 0
+		# The spam stream only yields items that were actually removed as spam
+		if self.stream_name == "spam": self._item_filter = self.__is_actually_spam
+		else: self._item_filter = None
 
 
 	def remove_seen_attribute(self, attribute):
 		"""remove an item from the listing of seen items"""
-		self._seen_attributes.remove(attribute)
+		if attribute in self._seen_attributes:
+			self._seen_attributes.remove(attribute)
+			self._record_seen_attribute(attribute, added=False)
+
+
+	def add_seen_attribute(self, attribute):
+		"""add an item to the listing of seen items"""
+		self._seen_attributes.add(attribute)
+		self._record_seen_attribute(attribute)
+
+
+	def _record_seen_attribute(self, attribute, added=True):
+		"""
+		Append an addition or removal of a seen item to the stream's journal.
+
+		Each line of the journal is `+` (added) or `-` (removed), followed by 
+		the JSON-encoded attribute. Writes are buffered, and flushed once per
+		fetch by the generator. If the journal can't be opened, seen items are
+		only kept in memory for the rest of the stream's life.
+		"""
+		if self._journal is None:
+			if self._journal_unwritable: return
+			try: self._journal = open(self._save_location, "a", encoding="utf-8")
+			except OSError as e:
+				self._journal_unwritable = True
+				msg = f"Unable to open '{self._save_location}' ({e}); "
+				msg += f"{self.stream_name} will not save its position."
+				logger.warning(msg)
+				return
+		operation = "+" if added else "-"
+		self._journal.write(f"{operation}{json.dumps(attribute)}\n")
+		self._journal_lines += 1
 
 
 	def _save_seen_attributes(self):
 		"""
 		Saves Seen Items to a file.
 
-		This method saves seen items to a file to persist a stream's 
-		position across reboots of the software. Files are saved to
-		".Stream" directory, located in the same directory this
-		file is run from. File is saved as `<sub>-<kind>-seen_attributes.pkl`.
-		
-		For example, for a Stream monitoring the "submissions" stream on 
-		subreddit "test", the resulting output file would be 
-		"test-submissions-seen_attributes.pkl"
+		Seen items are journaled to a file as they're added, to persist a 
+		stream's position across reboots of the software. Files are saved to
+		the `.cache-<subreddit_name>` directory, located in the same directory 
+		this file is run from, as `<stream_name>.log`. 
 
+		This method flushes and closes the journal. Once the journal holds more
+		than twice as many entries as the seen items can, it is compacted down
+		to just the current seen items.
 		"""
-		# Ensure our save directory exists
-		try: Path(self._location_base).mkdir(exist_ok=True)
-		except: return
-		# `wb` for "Write Bytes" - pickle objects are bytes not strings
-		with open(self._save_location, "wb") as output_file:
-			pickle.dump(self._seen_attributes, output_file)
+		if self._journal is not None:
+			self._journal.close()
+			self._journal = None
+		if self._journal_lines > 2 * self._seen_attributes.max_items:
+			self.__compact_seen_attributes()
+
+
+	def _flush_seen_attributes(self):
+		"""
+		Flush the journal to disk, compacting it once it holds more than twice
+		as many entries as the seen items can. Called by the generator once 
+		per fetch.
+		"""
+		if self._journal_lines > 2 * self._seen_attributes.max_items:
+			self._save_seen_attributes()
+		elif self._journal is not None:
+			self._journal.flush()
+
+
+	def __compact_seen_attributes(self):
+		"""
+		Rewrite the journal so it only contains the current seen items. 
+		Returns `True` if the journal was rewritten, else `False`.
+		"""
+		temp_location = f"{self._save_location}.tmp"
+		try:
+			with open(temp_location, "w", encoding="utf-8") as output_file:
+				for attribute in self._seen_attributes:
+					output_file.write(f"+{json.dumps(attribute)}\n")
+			os.replace(temp_location, self._save_location)
+		except OSError as e:
+			logger.warning(f"Unable to compact '{self._save_location}': {e}")
+			compacted = False
+		else:
+			compacted = True
+		# Even if compacting failed, wait for the journal to grow again before 
+		# retrying, rather than retrying on every fetch.
+		self._journal_lines = len(self._seen_attributes)
+		return compacted
 
 
 	def __load_seen_attributes(self):
 		"""
 		Loads Seen Items from a file.
 
-		This method loads seen items from a file to persist a stream's 
-		position across reboots of the software. Files are saved to the
-		".Stream" directory, located in the same directory this
-		file is run from. File is saved as `<sub>-<kind>-seen_attributes.pkl`.
-		For example, for a RedditStream monitoring the "submissions" 
-		stream on subreddit "test", the resulting output file would be 
-		"test-submissions-seen_attributes.pkl"
+		This method replays the stream's journal (see 
+		`SubredditStream._save_seen_attributes`) to restore the stream's 
+		position. Streams saved by older versions of the framework as a
+		`<stream_name>.pkl` pickle are loaded and converted to a journal.
 		"""
+		seen_attributes = BoundedSet(CFG.seen_items)
+		skipped_lines = 0
 		try:
-			with open(self._save_location, "rb") as input_file:
-				return pickle.load(input_file)
-		except:
-			return BoundedSet(1001)
+			with open(self._save_location, encoding="utf-8") as input_file:
+				for line in input_file:
+					try: attribute = json.loads(line[1:])
+					# Usually a partially-written line if the bot died mid-write
+					except ValueError:
+						skipped_lines += 1
+						continue
+					# JSON has no tuples; `edited` attributes are stored as lists
+					if isinstance(attribute, list): attribute = tuple(attribute)
+					if line[0] == "-": seen_attributes.remove(attribute)
+					else: seen_attributes.add(attribute)
+					self._journal_lines += 1
+			if skipped_lines:
+				msg = f"Skipped {skipped_lines} unreadable line(s) in "
+				msg += f"'{self._save_location}'."
+				logger.warning(msg)
+			if self._journal_lines > 2 * seen_attributes.max_items:
+				self._seen_attributes = seen_attributes
+				self.__compact_seen_attributes()
+			return seen_attributes
+		except FileNotFoundError:
+			pass
+		try:
+			with open(self._legacy_save_location, "rb") as input_file:
+				seen_attributes = pickle.load(input_file)
+		except FileNotFoundError:
+			return seen_attributes
+		# Unpickling a corrupt file can raise nearly anything
+		except Exception as e:
+			msg = f"Unable to load '{self._legacy_save_location}' ({e!r}); "
+			msg += f"{self.stream_name} will start without seen items."
+			logger.warning(msg)
+			return seen_attributes
+		# Pickles keep the size they were saved with; use the configured size
+		seen_attributes.resize(CFG.seen_items)
+		self._seen_attributes = seen_attributes
+		# Keep the pickle until its items are safely in a journal
+		if self.__compact_seen_attributes():
+			try: os.remove(self._legacy_save_location)
+			except OSError: pass
+		return seen_attributes
 
 
 	def _get_listing(self, wikipage=None, timeframe="All"):
@@ -744,7 +1098,7 @@ class SubredditStream:
 		calling `item._fetch()` will perform a fetch on the item to ensure we 
 		have the updated information. On failing to get an updated item, this 
 		method will sleep for 1 second and then attempt to fetch it again, up
-		to the number of times specified by `EDIT_FETCH_ATTEMPTS`, found in
+		to the number of times specified by `Edit_Fetch_Attempts`, found in
 		config.ini (defaults to 1 attempt).
 		"""
 		if self._wait_for_edit > 0:
@@ -756,6 +1110,52 @@ class SubredditStream:
 		return item
 
 
+	def __schedule_next_poll(self, found_items):
+		"""
+		Update the stream's average time between new items, and schedule the 
+		next fetch for when a new item is expected.
+
+		The average is an exponentially weighted moving average. A fetch that 
+		finds nothing only counts once the wait since the last new item is 
+		longer than the average, so quiet streams back off while busy streams
+		keep being fetched every loop. Fetches are never scheduled more than 
+		`Max_Wait` seconds apart.
+		"""
+		now = monotonic()
+		if found_items:
+			sample = (now - self._last_arrival) / found_items
+			self._last_arrival = now
+		else:
+			sample = now - self._last_arrival
+		if self._ewma_arrival is None:
+			self._ewma_arrival = sample
+		elif found_items or sample > self._ewma_arrival:
+			self._ewma_arrival += _ARRIVAL_SMOOTHING * (sample - self._ewma_arrival)
+		self._next_poll = now + min(self._ewma_arrival, CFG.max_wait)
+
+
+	def __fetch_after_bad_request(self, praw_listing, limit, params, anchor):
+		"""
+		Retry a fetch Reddit rejected because of the item used as `before`.
+
+		The rejected item is removed from seen items, and the fetch retried 
+		with the most recent remaining seen item as `before`. After 
+		`_BAD_REQUEST_RETRIES` rejected items, or once we run out of seen 
+		items, falls back to fetching without `before`.
+		"""
+		for _ in range(_BAD_REQUEST_RETRIES):
+			msg = "Got Bad Request from Reddit. Removing '{}' from seen attributes"
+			logger.debug(msg, anchor)
+			self.remove_seen_attribute(anchor)
+			if not len(self._seen_attributes): break
+			anchor = self._seen_attributes[-1]
+			params['before'] = _before_fullname(anchor)
+			try: return list(praw_listing(limit=limit, params=params))
+			except BadRequest: continue
+		params['before'] = None
+		return list(praw_listing(limit=limit, params=params))
+
+
 	def __generator(
 			self
 			, listingGen=None
@@ -805,41 +1205,34 @@ class SubredditStream:
 		of a coward right now to try renaming this `stream()` and figuring out 
 		what (if anything) breaks.
 		"""
-		def __attribute_yielded(item):
-			"""
-			determine whether an item has already been yielded or not.
-			Returns `True` if item has been yielded, else `False`.
-			"""
-			fetch_attribute = listingGen['attribute']
-			if fetch_attribute == "edited":
-				item = self.__get_edit_time(item)
-				fullname = getattr(item, "fullname")
-				edited = getattr(item, "edited")
-				attribute = tuple([fullname, edited])
-			else:
-				attribute = getattr(item, fetch_attribute)
-			if attribute not in self._seen_attributes: return attribute
-			else: return True
-
 		if not listingGen: listingGen = self._listing
 		praw_listing = listingGen['source']
+		fetch_attribute = listingGen['attribute']
+
+		# The kind of attribute is fixed for the life of the generator, so 
+		# pick how to read it once rather than for every item.
+		if fetch_attribute == "edited":
+			get_edited = attrgetter("fullname", "edited")
+
+			def get_attribute(item):
+				"""
+				returns (fullname, edited), fetching the edit first if it 
+				hasn't come through yet.
+				"""
+				return get_edited(self.__get_edit_time(item))
+		else:
+			get_attribute = attrgetter(fetch_attribute)
 
 		limit = 100 # max number of items that can be yielded at one time
 
-		params = {}
-		# add params from the Class
-		for key, value in self.params.items(): params[key] = value
-		# add/modify params passed as keyword arguments
-		for key, value in kwargs.items(): params[key] = value
+		# add/modify params passed as keyword arguments. `params` is modified
+		# below, so the prepared params are always copied.
+		if kwargs: params = _prepare_params({**self._prepared_params, **kwargs})
+		else: params = dict(self._prepared_params)
 
 		# prime the last item time with the current time. Used to determine 
 		# whether a full fetch is neccesary.
-		last_item_time = time()
-
-		# Submissions are called links as far as the API is concerned
-		if "only" in params.keys():
-			if params["only"] == "submissions":
-				params["only"] = "links"
+		last_item_time = monotonic()
 
 		# this is the main loop that generates items
 		while True:
@@ -850,85 +1243,91 @@ class SubredditStream:
 				praw_listing = self._listing['source']
 				self.stream_alive = True
 
-			has_found_items = False
-			if len(self._seen_attributes) == 0:
-				before = None
-			elif len(self._seen_attributes) == 1:
-				before = self._seen_attributes[0]
-			elif time() - last_item_time > max_time_before_full_fetch:
-				before = None
-				last_item_time = time()
-				msg =  f"longer than {max_time_before_full_fetch} since last "
-				msg += f"yield on {self.stream_name}, doing full fetch"
-				logger.debug(msg)
+			# Don't spend an API call on a stream that isn't expecting new items
+			if CFG.adaptive_polling and monotonic() < self._next_poll:
+				yield None
+				continue
+
+			found_items = 0
+			seen = self._seen_attributes
+			seen_count = len(seen)
+			if seen_count == 0:
+				anchor = None
+			elif seen_count == 1:
+				anchor = seen[0]
+			elif monotonic() - last_item_time > max_time_before_full_fetch:
+				anchor = None
+				last_item_time = monotonic()
+				msg = "longer than {} since last yield on {}, doing full fetch"
+				logger.debug(msg, max_time_before_full_fetch, self.stream_name)
 			else:
 				# if we have multiple attributes, randomly fetch either the 
 				# most recent or the one before that, to help prevent unneeded
 				# full fetches if the most recent item has gone away.
-				max_attribute = len(self._seen_attributes) - 1
-				min_attribute = max_attribute - 2
-				before_list = [min_attribute, max_attribute]
-				before_list.sort()
-				before_index = randint(before_list[0],before_list[1])
-				before = self._seen_attributes[before_index]
-				if isinstance(before, list): before = before[0]
+				max_attribute = seen_count - 1
+				min_attribute = max(0, max_attribute - 2)
+				anchor = seen[self._rng.randint(min_attribute, max_attribute)]
 
 			# Fetch from Reddit
 			try:
-				params['before'] = before
+				params['before'] = _before_fullname(anchor)
 				items = list(praw_listing(limit=limit, params=params))
 			except KeyboardInterrupt:
 				raise KeyboardInterrupt
 			except GeneratorExit:
 				return
 			except BadRequest:
-				msg = f"Got Bad Request from Reddit. Removing '{before}'"
-				msg += "from seen attributes"
-				logger.debug(msg)
-				self.remove_seen_attribute(before)
-				items = list(praw_listing(limit=limit))
+				items = self.__fetch_after_bad_request(
+					praw_listing, limit, params, anchor
+				)
+			except ServerError as e:
+				if raise_errors: raise e
+				# Reddit's having a moment; there's no need to rebuild the
+				# listing, so just wait and try again.
+				msg = f"Caught praw ServerError: '{str(e)}'. Attempting to "
+				msg += f"continue in {CFG.exception_pause} seconds..."
+				logger.warning(msg)
+				sleep(CFG.exception_pause)
+				items = []
 			except Exception as e:
 				if raise_errors:
 					raise e
 				else:
+					items = []
 					self.stream_alive = False
 					msg = f"Caught praw RequestException. Attempting "
-					msg += f"to continue in {EXCEPTION_PAUSE} seconds..."
+					msg += f"to continue in {CFG.exception_pause} seconds..."
 					logger.error(msg)
-					sleep(EXCEPTION_PAUSE)
-
-			# Reddit listings are from newest to oldest; we need to reverse this
-			# so that we're yielding items chronologically.
-			items.reverse()
-
-			# Yield found items
-			for item in items:
+					sleep(CFG.exception_pause)
+
+			# Yield found items. Reddit listings are from newest to oldest; we 
+			# need to reverse this so that we're yielding items chronologically.
+			item_filter = self._item_filter
+			seen_contains = self._seen_attributes.__contains__
+			add_seen_attribute = self.add_seen_attribute
+			for item in reversed(items):
 				# Check if items' already been yielded; if so, don't yield again
-				attribute = __attribute_yielded(item)
-				if attribute == True:
-					continue
-				has_found_items = True
-				self._seen_attributes.add(attribute)
-				if self.stream_name == "spam":
-					if not self.__is_actually_spam(item): continue
-				last_item_time = time()
+				attribute = get_attribute(item)
+				if seen_contains(attribute): continue
+				found_items += 1
+				add_seen_attribute(attribute)
+				if item_filter is not None and not item_filter(item): continue
 				yield StreamItem(self.stream_name, item)
+			if found_items: last_item_time = monotonic()
+			self._flush_seen_attributes()
+			if CFG.adaptive_polling: self.__schedule_next_poll(found_items)
 
 			# We yield `None` when the stream is exhausted, so we can indicate
 			# that we're ready to check the next stream (if running multiple)
-			# if ExponentialCounter ever goes away, we can replace the next 7 
+			# if ExponentialCounter ever goes away, we can replace the next 
 			# lines with a single `yield None`; the counter stuff is just for 
 			# the legacy counter.
-			if has_found_items:
-				self._counter.reset()
-				yield None
-			else:
-				if not self._counter.incremented:
+			with _COUNTER_LOCK:
+				if found_items:
+					self._counter.reset()
+				elif not self._counter.incremented:
 					self._counter.increment()
-				yield None
-
-			# Try to avoid caches by fetching a random number of items each time
-			limit = randint(90, 100)
+			yield None
 
 
 	def stream(self, **kwargs):
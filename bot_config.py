@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+from configparser import ConfigParser
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_config(path="config.ini"):
+	"""
+	Read the bot's config file. The file is parsed once and the resulting
+	ConfigParser is shared by every module that asks for it.
+
+	Params
+	------
+	path : str
+		location of the config file. Defaults to `config.ini`
+
+	Returns
+	-------
+	ConfigParser
+	"""
+	config = ConfigParser()
+	config.read(path)
+	return config
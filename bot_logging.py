@@ -2,10 +2,10 @@
 
 from loguru import logger #Must be first import
 from sys import stdout
-from configparser import ConfigParser
 
-config = ConfigParser()
-config.read('config.ini')
+from bot_config import load_config
+
+config = load_config()
 LOG_NAME = config["LOGGING"].get("Log_Name", "fenix-bot")
 LOG_RETENTION_DAYS = config["LOGGING"].getint("Retention_Days", 30)
 DEBUG_LOGS = config["LOGGING"].getboolean("Debug_Logs", False)
@@ -14,22 +14,28 @@ TRACEBACK = config["LOGGING"].getboolean("Traceback", False)
 # Remove the default logger
 logger.remove() 
 
-# Set custom log levels
-ephemeral_level     = logger.level("EPHEMERAL", no=11)
-submissions_level   = logger.level("SUBMISSIONS", no=20)
-comments_level      = logger.level("COMMENTS", no=20)
-hot_level           = logger.level("HOT", no=20)
-rising_level        = logger.level("RISING", no=20)
-top_level           = logger.level("TOP", no=20)
-controversial_level = logger.level("CONTROVERSIAL", no=20)
-unmoderated_level   = logger.level("UNMODEREATED", no=20)
-spam_level          = logger.level("SPAM", no=20)
-removed_level       = logger.level("REMOVED", no=20)
-modqueue_level      = logger.level("MODQUEUE", no=20)
-edited_level        = logger.level("EDITED", no=20)
-modlog_level        = logger.level("MODLOG", no=20)
-mm_convo_level      = logger.level("MODMAIL", no=20)
-reports_level       = logger.level("REPORTS", no=20)
+# Set custom log levels. Levels that already exist (for example, if RedditLogs
+# was imported first) are left alone, as loguru won't re-register a level.
+custom_levels = (
+	("EPHEMERAL", 11)
+	, ("SUBMISSIONS", 20)
+	, ("COMMENTS", 20)
+	, ("HOT", 20)
+	, ("RISING", 20)
+	, ("TOP", 20)
+	, ("CONTROVERSIAL", 20)
+	, ("UNMODERATED", 20)
+	, ("SPAM", 20)
+	, ("REMOVED", 20)
+	, ("MODQUEUE", 20)
+	, ("EDITED", 20)
+	, ("MODLOG", 20)
+	, ("MODMAIL", 20)
+	, ("REPORTS", 20)
+)
+for name, no in custom_levels:
+	try: logger.level(name)
+	except ValueError: logger.level(name, no=no)
 
 # Set Log formats for console and text file log
 log_format = "{time: YYYY-MM-DD HH:mm:ss:SSZZ} | {level: <14} | "
@@ -45,6 +51,8 @@ else:
 	log_level = "INFO"
 	console_log_level = "EPHEMERAL"
 
+# Sinks are enqueued so that formatting and writing happen on loguru's worker
+# thread rather than blocking the streams.
 # Add the text log.
 logger.add(
 	f"{LOG_NAME}.log"
@@ -53,6 +61,7 @@ logger.add(
 	, format=log_format
 	, backtrace=DEBUG_LOGS
 	, diagnose=DEBUG_LOGS
+	, enqueue=True
 )
 
 # Add the Console log.
@@ -61,4 +70,5 @@ logger.add(
 	, format=console_format
 	, colorize=True
 	, level=console_log_level
+	, enqueue=True
 )
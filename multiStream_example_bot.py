@@ -1,12 +1,11 @@
 #!/usr/bin/env python3
-from configparser import ConfigParser
 
 import praw
 
+from bot_config import load_config
 from SubredditStream import MultiStream
 
-config = ConfigParser()
-config.read('config.ini')
+config = load_config()
 CLIENT_ID = config["PRAW"].get("client_id")
 CLIENT_SECRET = config["PRAW"].get("client_secret")
 USER_AGENT = config["PRAW"].get("user_agent")